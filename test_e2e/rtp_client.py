@@ -6,126 +6,460 @@ Audio format: PCM 16-bit @ 24kHz mono
 
 import socket
 import pyaudio
-import time
-import threading
 import argparse
-import random
+import collections
+import os
+import selectors
 import struct
-from rtp import RTP, PayloadType
+import sys
+import time
+
+import udp_batch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 SAMPLE_RATE = 24000
 CHUNK = 480  # 20ms at 24kHz
 
+RTP_HEADER_SIZE = 12
+RTP_VERSION = 0x80  # V=2, no padding, no extension, no CSRCs
+RTP_PAYLOAD_TYPE = 96
+PACKET_SIZE = RTP_HEADER_SIZE + CHUNK * 2
+
+# Precompiled header layouts: first byte + sequence number on receive,
+# sequence number + timestamp on send (the rest of the header is constant)
+RTP_RECV_HEADER = struct.Struct(">BxH")
+RTP_SEQ_TS = struct.Struct(">HI")
+
+# Upper bound on frames sent per syscall when capture has backed up
+SEND_BATCH = 8
+
+# Captured frames kept while the loop is stalled; older ones are dropped
+CAPTURE_QUEUE_FRAMES = 25  # 500ms
+
+# Consecutive I/O errors after which the client gives up
+MAX_CONSECUTIVE_ERRORS = 10
+
+# Received frames buffered before playback starts, and again after an underrun
+DEFAULT_PLAY_BATCH = 2  # 40ms
+
+# Playback ring between the event loop and PortAudio's output callback; a power
+# of two so positions wrap with a mask
+PLAY_RING_SIZE = 1 << 15  # ~680ms
+# Playback can't wait for more frames than the ring holds
+MAX_PLAY_BATCH = PLAY_RING_SIZE // (CHUNK * 2)
+
 DEFAULT_LOCAL_PORT = 10000
 DEFAULT_REMOTE_IP = "127.0.0.1"
 DEFAULT_REMOTE_PORT = 5060
 
+# Linux socket option the socket module may not export
+SO_BUSY_POLL = getattr(socket, "SO_BUSY_POLL", 46)
+BUSY_POLL_USEC = 50
+
+# Headroom for bursts while the loop is stalled (GC, scheduling)
+SOCKET_BUFFER_SIZE = 4 << 20
+
+
+if njit:
+
+    @njit(cache=True)
+    def _build_rtp(out, start, pcm, seq, ts):
+        """Fill in seq/timestamp and the byteswapped little-endian PCM at out[start:].
+
+        The constant header fields are expected to be in place already.
+        """
+        out[start + 2] = (seq >> 8) & 0xFF
+        out[start + 3] = seq & 0xFF
+        for i in range(4):
+            out[start + 4 + i] = (ts >> (24 - 8 * i)) & 0xFF
+        base = start + 12
+        for i in range(pcm.size // 2):
+            out[base + 2 * i] = pcm[2 * i + 1]
+            out[base + 2 * i + 1] = pcm[2 * i]
+
+else:
+    _build_rtp = None
+
+
+# Byte-pair masks for swap16, keyed by buffer size
+_SWAR_MASKS = {}
+
+
+def swap16(data) -> bytes:
+    """Swap the bytes of every 16-bit sample without NumPy.
+
+    Treats the whole buffer as one integer and swaps all byte pairs with a
+    single mask-and-shift (SWAR), so the work stays in C.
+    """
+    size = len(data) & ~1
+    mask = _SWAR_MASKS.get(size)
+    if mask is None:
+        mask = _SWAR_MASKS[size] = int.from_bytes(b"\xff\x00" * (size // 2), "little")
+    x = int.from_bytes(data[:size], "little")
+    return (((x & mask) << 8) | ((x >> 8) & mask)).to_bytes(size, "little")
+
+
+class PlaybackRing:
+    """Single-producer/single-consumer byte ring for received audio.
+
+    head and tail are running byte counts. Only the event loop advances head
+    and only PortAudio's callback thread advances tail, so neither side takes
+    a lock; a position is published only after the bytes behind it are written.
+    """
+
+    def __init__(self, size: int = PLAY_RING_SIZE):
+        if size & (size - 1):
+            raise ValueError("ring size must be a power of two")
+        self.size = size
+        self.mask = size - 1
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.head = 0
+        self.tail = 0
+
+    def available(self) -> int:
+        return self.head - self.tail
+
+    def free(self) -> int:
+        return self.size - (self.head - self.tail)
+
+    def read(self, size: int) -> bytes:
+        """Consume up to `size` bytes (consumer side only)."""
+        size = min(size, self.head - self.tail)
+        pos = self.tail & self.mask
+        first = min(size, self.size - pos)
+        if first == size:
+            data = bytes(self.mv[pos : pos + size])
+        else:
+            data = bytes(self.mv[pos:]) + bytes(self.mv[: size - first])
+        self.tail += size
+        return data
+
 
 class RTPClient:
-    def __init__(self, local_port, remote_ip, remote_port):
+    def __init__(self, local_port, remote_ip, remote_port, cpu=None, play_batch=DEFAULT_PLAY_BATCH):
         self.local_port = local_port
         self.remote_ip = remote_ip
         self.remote_port = remote_port
+        self.cpu = cpu
+        self.play_batch = min(max(1, play_batch), MAX_PLAY_BATCH)
 
-        self.ssrc = random.randint(0, 0xFFFFFFFF)
-        self.sequence_number = random.randint(0, 65535)
-        self.timestamp = random.randint(0, 0xFFFFFFFF)
+        # RFC 3550 wants these unpredictable; draw them from the OS
+        self.ssrc, self.sequence_number, self.timestamp = struct.unpack(
+            ">IHI", os.urandom(10)
+        )
 
-        self.send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.recv_sock.bind(("0.0.0.0", local_port))
+        # One socket for both directions. It is deliberately not connect()ed:
+        # the bridge's udpsink sends from its own ephemeral port, which a
+        # connected socket would filter out. The remote is resolved once here,
+        # so a hostname works and isn't looked up again per packet.
+        self.remote_addr = socket.getaddrinfo(
+            remote_ip, remote_port, socket.AF_INET, socket.SOCK_DGRAM
+        )[0][4]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        self._tune_socket()
+        self.sock.bind(("0.0.0.0", local_port))
+
+        # Move several queued datagrams per syscall where recvmmsg/sendmmsg exist
+        self._recv_batch = None
+        self._send_batch = None
+
+        # Persistent buffers, one per direction, reused for every frame. Outgoing
+        # samples are swapped straight into the payload area of one of the
+        # SEND_BATCH packet slots; _tx_samples is a strided view over them.
+        self._pkt_buf = bytearray(SEND_BATCH * PACKET_SIZE)
+        self._pkt_mv = memoryview(self._pkt_buf)
+        if np:
+            self._tx_samples = np.ndarray(
+                (SEND_BATCH, CHUNK),
+                dtype=">i2",
+                buffer=self._pkt_buf,
+                offset=RTP_HEADER_SIZE,
+                strides=(PACKET_SIZE, 2),
+            )
+        if _build_rtp:
+            self._pkt_u8 = np.frombuffer(self._pkt_buf, dtype=np.uint8)
+            # Compile now rather than on the first captured frame
+            _build_rtp(self._pkt_u8, 0, np.zeros(CHUNK * 2, dtype=np.uint8), 0, 0)
+
+        # Version, payload type and SSRC never change: write them into every
+        # slot once, so each packet only needs its sequence number and timestamp
+        for slot in range(SEND_BATCH):
+            struct.pack_into(
+                ">BB", self._pkt_buf, slot * PACKET_SIZE, RTP_VERSION, RTP_PAYLOAD_TYPE
+            )
+            struct.pack_into(">I", self._pkt_buf, slot * PACKET_SIZE + 8, self.ssrc)
+        # Incoming samples are swapped straight into the playback ring, which
+        # PortAudio drains from its own thread. Playback (re)starts once
+        # play_batch frames are queued, so jitter doesn't cause a click per frame.
+        self._play_ring = PlaybackRing()
+        if np:
+            self._play_samples = np.frombuffer(self._play_ring.buf, dtype="<i2")
+        self._play_prebuffer = CHUNK * 2 * self.play_batch
+        self._playing = False
+
+        # Receive buffer for the one-packet-per-syscall path
+        self._rx_buf = bytearray(4096)
+        self._rx_mv = memoryview(self._rx_buf)
+
+        if udp_batch.HAVE_MMSG:
+            self._recv_batch = udp_batch.RecvBatch(self.sock)
+            self._send_batch = udp_batch.SendBatch(
+                self.sock, self.remote_addr, self._pkt_buf, PACKET_SIZE
+            )
+
+        # Captured frames are queued by PortAudio's callback thread; a byte on
+        # the self-pipe wakes the event loop to send them. The queue is bounded
+        # so a stalled loop drops stale audio rather than building up latency.
+        self._capture = collections.deque(maxlen=CAPTURE_QUEUE_FRAMES)
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
 
         self.audio = pyaudio.PyAudio()
-        self.stream = self.audio.open(
+        self.input_stream = self.audio.open(
             format=pyaudio.paInt16,
             channels=1,
             rate=SAMPLE_RATE,
             input=True,
+            frames_per_buffer=CHUNK,
+            stream_callback=self._audio_callback,
+        )
+        self.output_stream = self.audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=SAMPLE_RATE,
             output=True,
             frames_per_buffer=CHUNK,
+            stream_callback=self._play_callback,
         )
 
         self.running = True
         self.packets_sent = 0
         self.packets_received = 0
+        self.packets_lost = 0
+        self.playback_overruns = 0
+        self.last_seq = None
 
-    def pcm_to_network(self, pcm_data: bytes) -> bytes:
-        """Convert PCM from little-endian to big-endian (network order)."""
-        samples = struct.unpack(f"<{len(pcm_data)//2}h", pcm_data)
-        return struct.pack(f">{len(samples)}h", *samples)
+    def _tune_socket(self):
+        """Busy-poll the RTP socket briefly before sleeping, where permitted."""
+        if not sys.platform.startswith("linux"):
+            return
 
-    def network_to_pcm(self, network_data: bytes) -> bytes:
-        """Convert PCM from big-endian (network order) to little-endian."""
-        samples = struct.unpack(f">{len(network_data)//2}h", network_data)
-        return struct.pack(f"<{len(samples)}h", *samples)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, SO_BUSY_POLL, BUSY_POLL_USEC)
+        except OSError as e:
+            print(f"SO_BUSY_POLL not set: {e}")
+
+    def pcm_to_network(self, pcm_data: bytes, slot: int = 0) -> memoryview:
+        """Convert PCM from little-endian to big-endian (network order).
+
+        The samples are written into the payload area of packet slot `slot`;
+        the result is a view of it that is reused by later calls.
+        """
+        n = len(pcm_data) // 2
+        start = slot * PACKET_SIZE + RTP_HEADER_SIZE
+        if np:
+            self._tx_samples[slot, :n] = np.frombuffer(pcm_data, dtype="<i2", count=n)
+        else:
+            self._pkt_mv[start : start + n * 2] = swap16(pcm_data)
+        return self._pkt_mv[start : start + n * 2]
+
+    def _swap_into_ring(self, pos: int, network_data):
+        size = len(network_data)
+        if np:
+            self._play_samples[pos // 2 : (pos + size) // 2] = np.frombuffer(
+                network_data, dtype=">i2"
+            )
+        else:
+            self._play_ring.mv[pos : pos + size] = swap16(network_data)
+
+    def network_to_pcm(self, network_data: bytes) -> bool:
+        """Convert PCM from big-endian (network order) to little-endian.
+
+        The samples are queued on the playback ring. Returns False, dropping
+        the frame, if the ring has no room for it.
+        """
+        ring = self._play_ring
+        size = len(network_data) & ~1
+        if size > ring.free():
+            self.playback_overruns += 1
+            return False
+
+        pos = ring.head & ring.mask
+        first = min(size, ring.size - pos)
+        self._swap_into_ring(pos, network_data[:first])
+        if first < size:
+            self._swap_into_ring(0, network_data[first:size])
+        ring.head += size
+        return True
+
+    def _play_callback(self, in_data, frame_count, time_info, status):
+        ring = self._play_ring
+        size = frame_count * 2
+
+        if not self._playing:
+            if ring.available() < self._play_prebuffer:
+                return bytes(size), pyaudio.paContinue
+            self._playing = True
+
+        data = ring.read(size)
+        if len(data) < size:
+            # Underrun: pad with silence and rebuffer before resuming
+            self._playing = False
+            data += bytes(size - len(data))
+        return data, pyaudio.paContinue
 
     def parse_rtp(self, packet_data):
-        try:
-            packet = RTP()
-            packet.fromBytes(packet_data)
-            return bytes(packet.payload), packet.sequenceNumber
-        except:
+        if len(packet_data) < RTP_HEADER_SIZE or (packet_data[0] & 0xC0) != RTP_VERSION:
             return None, None
-
-    def send_loop(self):
-        while self.running:
-            try:
-                pcm_data = self.stream.read(CHUNK, exception_on_overflow=False)
-                network_data = self.pcm_to_network(pcm_data)
-
-                packet = RTP(
-                    payloadType=PayloadType.DYNAMIC_96,
-                    sequenceNumber=self.sequence_number,
-                    timestamp=self.timestamp,
-                    ssrc=self.ssrc,
-                    payload=bytearray(network_data),
-                )
-
-                self.send_sock.sendto(packet.toBytes(), (self.remote_ip, self.remote_port))
-                self.sequence_number = (self.sequence_number + 1) & 0xFFFF
-                self.timestamp = (self.timestamp + CHUNK) & 0xFFFFFFFF
-                self.packets_sent += 1
-
-            except Exception as e:
-                print(f"Send error: {e}")
-                time.sleep(0.01)
-
-    def recv_loop(self):
-        self.recv_sock.settimeout(0.1)
-        last_seq = None
-
-        while self.running:
+        v_p_x_cc, seq = RTP_RECV_HEADER.unpack_from(packet_data)
+        return packet_data[RTP_HEADER_SIZE + 4 * (v_p_x_cc & 0x0F) :], seq
+
+    def build_packet(self, slot: int, pcm_data: bytes) -> memoryview:
+        """Assemble the next RTP packet in slot `slot` and return a view of it."""
+        start = slot * PACKET_SIZE
+
+        if _build_rtp:
+            payload_size = len(pcm_data) & ~1
+            _build_rtp(
+                self._pkt_u8,
+                start,
+                np.frombuffer(pcm_data, dtype=np.uint8, count=payload_size),
+                self.sequence_number,
+                self.timestamp,
+            )
+        else:
+            payload_size = len(self.pcm_to_network(pcm_data, slot))
+            RTP_SEQ_TS.pack_into(self._pkt_buf, start + 2, self.sequence_number, self.timestamp)
+
+        self.sequence_number = (self.sequence_number + 1) & 0xFFFF
+        self.timestamp = (self.timestamp + CHUNK) & 0xFFFFFFFF
+
+        return self._pkt_mv[start : start + RTP_HEADER_SIZE + payload_size]
+
+    def _audio_callback(self, in_data, frame_count, time_info, status):
+        self._capture.append(in_data)
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass  # loop is already due to wake up
+        return None, pyaudio.paContinue
+
+    def send_packets(self, packets):
+        # sendmmsg only pays off once frames have backed up; the steady state
+        # of one frame per wakeup takes the plain sendto path
+        if self._send_batch and len(packets) > 1:
+            self._send_batch.send([len(p) for p in packets])
+        else:
+            for packet in packets:
+                self.sock.sendto(packet, self.remote_addr)
+        self.packets_sent += len(packets)
+
+    def on_capture(self):
+        os.read(self._wake_r, 4096)
+
+        capture = self._capture
+        popleft = capture.popleft
+        build_packet = self.build_packet
+        send_packets = self.send_packets
+
+        # If the loop fell behind, send the frames that piled up together
+        # instead of one syscall each
+        while capture:
+            packets = []
+            while capture and len(packets) < SEND_BATCH:
+                packets.append(build_packet(len(packets), popleft()))
+            send_packets(packets)
+
+    def handle_packet(self, packet):
+        network_data, seq_num = self.parse_rtp(packet)
+        if not network_data:
+            return
+
+        self.packets_received += 1
+
+        if self.last_seq is None:
+            self.last_seq = seq_num
+        else:
+            gap = (seq_num - self.last_seq - 1) & 0xFFFF
+            if gap < 0x8000:
+                # A forward jump skips `gap` packets. Counted here, reported at
+                # most once a second by run(); printing per event can stall the
+                # loop past the next frame
+                self.packets_lost += gap
+                self.last_seq = seq_num
+            # Otherwise the packet is late or duplicated: not a loss, and it
+            # must not move last_seq backwards
+
+        self.network_to_pcm(network_data)
+
+    def on_recv(self):
+        if self._recv_batch:
+            packets = self._recv_batch.recv()
+        else:
             try:
-                packet, _ = self.recv_sock.recvfrom(4096)
-                network_data, seq_num = self.parse_rtp(packet)
-                if not network_data:
-                    continue
-
-                self.packets_received += 1
+                # The selector can wake without a datagram (e.g. one dropped
+                # for a bad checksum); never block the loop waiting for one
+                n = self.sock.recv_into(self._rx_buf, 0, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return
+            packets = [self._rx_mv[:n]]
+
+        handle_packet = self.handle_packet
+        for packet in packets:
+            handle_packet(packet)
+
+    def run(self):
+        """Service capture and the RTP socket from a single event loop."""
+        sel = selectors.DefaultSelector()
+        sel.register(self._wake_r, selectors.EVENT_READ, self.on_capture)
+        sel.register(self.sock, selectors.EVENT_READ, self.on_recv)
+
+        select = sel.select
+        monotonic = time.monotonic
+        errors = 0
+        reported_lost = 0
+        next_report = monotonic() + 1.0
 
-                if last_seq is not None:
-                    expected = (last_seq + 1) & 0xFFFF
-                    if seq_num != expected:
-                        gap = (seq_num - expected) & 0xFFFF
-                        print(f"Packet loss: gap={gap}")
-
-                last_seq = seq_num
-                pcm_data = self.network_to_pcm(network_data)
-                self.stream.write(pcm_data)
-
-            except socket.timeout:
-                continue
-            except Exception as e:
-                print(f"Recv error: {e}")
-                time.sleep(0.01)
+        try:
+            while self.running:
+                events = select(timeout=0.1)
+
+                if monotonic() >= next_report:
+                    if self.packets_lost != reported_lost:
+                        print(f"Packet loss: {self.packets_lost - reported_lost} in last second")
+                        reported_lost = self.packets_lost
+                    next_report = monotonic() + 1.0
+
+                for key, _ in events:
+                    try:
+                        key.data()
+                        errors = 0
+                    except Exception as e:
+                        # Retry immediately; sleeping here would push the next
+                        # frame past its 20ms slot
+                        print(f"I/O error: {e}")
+                        errors += 1
+                        if errors > MAX_CONSECUTIVE_ERRORS:
+                            print("Too many consecutive errors, stopping")
+                            self.running = False
+                            break
+        finally:
+            sel.close()
 
     def start(self):
-        send_thread = threading.Thread(target=self.send_loop, daemon=True)
-        recv_thread = threading.Thread(target=self.recv_loop, daemon=True)
-
-        send_thread.start()
-        recv_thread.start()
-
         print("=" * 60)
         print("RTP Audio Client")
         print("=" * 60)
@@ -135,22 +469,27 @@ class RTPClient:
         print("=" * 60)
         print("Press Ctrl+C to stop...")
 
+        if self.cpu is not None and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {self.cpu})
+
         try:
-            while True:
-                time.sleep(1)
+            self.run()
         except KeyboardInterrupt:
             print("\nStopping...")
             self.running = False
-            send_thread.join(timeout=1)
-            recv_thread.join(timeout=1)
-            print(f"Sent: {self.packets_sent}, Received: {self.packets_received}")
+            print(
+                f"Sent: {self.packets_sent}, Received: {self.packets_received}, "
+                f"Lost: {self.packets_lost}, Playback overruns: {self.playback_overruns}"
+            )
 
     def cleanup(self):
-        self.stream.stop_stream()
-        self.stream.close()
+        for stream in (self.input_stream, self.output_stream):
+            stream.stop_stream()
+            stream.close()
         self.audio.terminate()
-        self.send_sock.close()
-        self.recv_sock.close()
+        self.sock.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
 
 
 def main():
@@ -158,9 +497,22 @@ def main():
     parser.add_argument("--local-port", type=int, default=DEFAULT_LOCAL_PORT)
     parser.add_argument("--remote-ip", default=DEFAULT_REMOTE_IP)
     parser.add_argument("--remote-port", type=int, default=DEFAULT_REMOTE_PORT)
+    parser.add_argument("--cpu", type=int, help="Pin the client process to this CPU (Linux)")
+    parser.add_argument(
+        "--play-batch",
+        type=int,
+        default=DEFAULT_PLAY_BATCH,
+        help=f"Received 20ms frames buffered before playback starts (max {MAX_PLAY_BATCH})",
+    )
     args = parser.parse_args()
 
-    client = RTPClient(args.local_port, args.remote_ip, args.remote_port)
+    client = RTPClient(
+        args.local_port,
+        args.remote_ip,
+        args.remote_port,
+        cpu=args.cpu,
+        play_batch=args.play_batch,
+    )
 
     try:
         client.start()
@@ -22,6 +22,9 @@ DEFAULT_WS_URI = "ws://localhost:8765"
 SAMPLE_RATE = 24000
 CHANNELS = 1
 
+# Kernel socket buffer size for udpsrc/udpsink, headroom for bursts
+SOCKET_BUFFER_SIZE = 4 << 20
+
 
 def setup_logging(debug: bool = False):
     level = logging.DEBUG if debug else logging.INFO
@@ -81,23 +84,28 @@ class RTPWebSocketBridge:
             f"encoding-name=L16,channels={CHANNELS},payload=96"
         )
 
-        # websockettransceiver outputs S16LE, rtpL16pay needs S16BE (network order)
+        # RTP L16 is S16BE (network order) while the WebSocket peer expects S16LE;
+        # websockettransceiver passes samples through untouched, so each direction
+        # needs exactly one byte swap. Pinning both sides of each audioconvert to
+        # the same rate/channels keeps it a plain endianness conversion.
         pipeline_desc = f"""
-            udpsrc port={self.rtp_port} caps="{input_caps}"
+            udpsrc port={self.rtp_port} caps="{input_caps}" buffer-size={SOCKET_BUFFER_SIZE}
             ! rtpL16depay
-            ! audioconvert
+            ! audio/x-raw,format=S16BE,rate={SAMPLE_RATE},channels={CHANNELS}
+            ! audioconvert dithering=none noise-shaping=none
             ! audio/x-raw,format=S16LE,rate={SAMPLE_RATE},channels={CHANNELS},layout=interleaved
             ! websockettransceiver name=ws uri={self.ws_uri}
                 sample-rate={SAMPLE_RATE}
                 channels={CHANNELS}
                 max-queue-size=50
-                initial-buffer-count=2
+                initial-buffer-count=1
                 frame-duration-ms=20
-            ! queue leaky=downstream max-size-buffers=100 max-size-time=0 max-size-bytes=0
-            ! audioconvert
+            ! queue leaky=no max-size-buffers=4 max-size-bytes=0 max-size-time=80000000
+            ! audioconvert dithering=none noise-shaping=none
             ! audio/x-raw,format=S16BE,rate={SAMPLE_RATE},channels={CHANNELS},layout=interleaved
             ! rtpL16pay min-ptime=20000000 max-ptime=20000000 pt=96
             ! udpsink host={self.client_ip} port={self.client_rtp_port} sync=false async=false
+                buffer-size={SOCKET_BUFFER_SIZE} auto-multicast=false
         """
 
         try:
@@ -8,25 +8,60 @@ Audio format: PCM 16-bit @ 24kHz mono (both input and output)
 
 import abc
 import asyncio
-import base64
-import json
+import itertools
 import logging
 import os
+import socket
 import sys
+import threading
 import uuid
 from typing import Optional
 
+import orjson
+import pybase64
 import websockets
 from websockets.server import WebSocketServerProtocol
 
 DEFAULT_HOST = "127.0.0.1"
 DEFAULT_PORT = 8765
+# Concurrent calls beyond this are rejected so a reconnect storm cannot
+# exhaust provider rate limits or file descriptors
+DEFAULT_MAX_CLIENTS = 64
 
 # Common audio format for all providers
 SAMPLE_RATE = 24000
 CHANNELS = 1
 BITS_PER_SAMPLE = 16
 
+# Client audio frames buffered while the provider is slow; oldest are dropped
+UPSTREAM_QUEUE_SIZE = 32
+
+# Provider audio deltas buffered while the client is slow; oldest are dropped
+DOWNSTREAM_QUEUE_SIZE = 50
+
+# Control message telling websockettransceiver to flush queued audio (barge-in)
+CLEAR_MESSAGE = '{"type":"clear"}'
+
+# Client frames are merged into one provider message of up to this many bytes
+# (80ms), waiting at most AUDIO_COALESCE_SECONDS for more frames to arrive
+AUDIO_COALESCE_BYTES = SAMPLE_RATE * CHANNELS * BITS_PER_SAMPLE // 8 * 80 // 1000
+AUDIO_COALESCE_SECONDS = 0.04
+
+# Provider audio deltas smaller than one 20ms frame are held for up to
+# DOWNSTREAM_COALESCE_SECONDS so they reach the client as one message
+DOWNSTREAM_COALESCE_BYTES = SAMPLE_RATE * CHANNELS * BITS_PER_SAMPLE // 8 * 20 // 1000
+DOWNSTREAM_COALESCE_SECONDS = 0.02
+
+# OpenAI audio deltas are dispatched without a full JSON parse when the event
+# type appears within the first AUDIO_DELTA_SCAN_CHARS characters; every
+# AUDIO_DELTA_CHECK_INTERVAL fast-path hits are cross-checked against orjson
+AUDIO_DELTA_TYPES = (
+    '"type":"response.output_audio.delta"',
+    '"type":"response.audio.delta"',
+)
+AUDIO_DELTA_SCAN_CHARS = 80
+AUDIO_DELTA_CHECK_INTERVAL = 1000
+
 
 def setup_logging(debug: bool = False) -> logging.Logger:
     level = logging.DEBUG if debug else logging.INFO
@@ -34,14 +69,26 @@ def setup_logging(debug: bool = False) -> logging.Logger:
         level=level,
         format="%(asctime)s - %(levelname)s - [%(name)s] %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
-        force=True,
     )
     logging.getLogger("websockets.client").setLevel(logging.INFO)
     logging.getLogger("websockets.server").setLevel(logging.INFO)
     return logging.getLogger(__name__)
 
 
-logger = setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def tune_tcp(transport):
+    """Disable Nagle and enable keepalive on a WebSocket's TCP socket.
+
+    Small realtime audio frames must not wait on Nagle's algorithm, and
+    keepalive detects dead peers on long idle calls.
+    """
+    sock = transport.get_extra_info("socket") if transport else None
+    if sock is None or sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
 
 
 class AIProvider(abc.ABC):
@@ -68,10 +115,38 @@ class AIProvider(abc.ABC):
         """Close connection to the AI service."""
         pass
 
+    @abc.abstractmethod
+    def _build_audio_event(self, audio_bytes: bytes) -> bytes:
+        """Serialize an audio chunk into the provider's input event."""
+        pass
+
 
 class OpenAIProvider(AIProvider):
     """OpenAI Realtime API provider."""
 
+    # Serialized up front so the greeting goes out as back-to-back sends
+    _GREETING_EVENTS = (
+        orjson.dumps({
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "user",
+                "content": [
+                    {
+                        "type": "input_text",
+                        "text": "Greet the user briefly and ask how you can help.",
+                    }
+                ],
+            },
+        }),
+        orjson.dumps({"type": "response.create"}),
+    )
+
+    # input_audio_buffer.append events only differ in their audio, so the
+    # JSON around it is fixed
+    _APPEND_PREFIX = b'{"type":"input_audio_buffer.append","audio":"'
+    _APPEND_SUFFIX = b'"}'
+
     def __init__(
         self,
         api_key: str,
@@ -87,6 +162,8 @@ class OpenAIProvider(AIProvider):
         self.system_prompt = system_prompt
         self.ws: Optional[WebSocketServerProtocol] = None
         self.connected = False
+        self._fast_path = True
+        self._fast_deltas = 0
 
     async def connect(self):
         """Establish WebSocket connection to OpenAI."""
@@ -94,7 +171,9 @@ class OpenAIProvider(AIProvider):
         headers = {"Authorization": f"Bearer {self.api_key}"}
 
         try:
-            self.ws = await websockets.connect(url, additional_headers=headers)
+            # Audio is near-incompressible; permessage-deflate only costs CPU
+            self.ws = await websockets.connect(url, additional_headers=headers, compression=None)
+            tune_tcp(self.ws.transport)
             self.connected = True
             self.logger.info(f"Connected to OpenAI: {self.model}")
 
@@ -136,14 +215,18 @@ class OpenAIProvider(AIProvider):
             },
         }
 
-        await self.ws.send(json.dumps(session_config))
+        await self.ws.send(orjson.dumps(session_config), text=True)
         self.logger.info(f"Session configured: PCM @ {SAMPLE_RATE}Hz")
 
     async def _receive_messages(self):
         """Receive and process messages from OpenAI."""
         try:
             async for message in self.ws:
-                data = json.loads(message)
+                delta = self._extract_audio_delta(message) if self._fast_path else None
+                if delta is not None:
+                    await self._handle_audio_delta(delta)
+                    continue
+                data = orjson.loads(message)
                 await self._handle_message(data)
         except websockets.exceptions.ConnectionClosed:
             self.logger.warning("OpenAI connection closed")
@@ -152,10 +235,52 @@ class OpenAIProvider(AIProvider):
             self.logger.error(f"Error receiving messages: {e}")
             self.connected = False
 
+    def _extract_audio_delta(self, message) -> Optional[str]:
+        """Return the base64 payload of an audio delta event, or None.
+
+        Only matches the compact shape OpenAI sends; anything else (other
+        event types, escaped characters, unexpected layout) returns None so
+        the caller falls back to a full parse.
+        """
+        if not isinstance(message, str):
+            return None
+        head = message[:AUDIO_DELTA_SCAN_CHARS]
+        if AUDIO_DELTA_TYPES[0] not in head and AUDIO_DELTA_TYPES[1] not in head:
+            return None
+        start = message.find('"delta":"')
+        if start < 0:
+            return None
+        start += 9
+        end = message.find('"', start)
+        if end < 0:
+            return None
+        delta = message[start:end]
+        if "\\" in delta:
+            return None
+
+        self._fast_deltas += 1
+        if self._fast_deltas % AUDIO_DELTA_CHECK_INTERVAL == 0:
+            data = orjson.loads(message)
+            if data.get("delta") != delta:
+                self.logger.warning("Audio delta fast path mismatch - disabling it")
+                self._fast_path = False
+                return None
+            self.logger.debug("Audio delta fast path: %d hits", self._fast_deltas)
+        return delta
+
+    async def _handle_audio_delta(self, audio_base64: str):
+        """Decode an audio delta and forward it to the client."""
+        if audio_base64 and self.audio_callback:
+            audio_bytes = pybase64.b64decode(audio_base64, validate=False)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Received %d bytes audio from OpenAI", len(audio_bytes))
+            await self.audio_callback(audio_bytes)
+
     async def _handle_message(self, data: dict):
         """Handle messages from OpenAI."""
         msg_type = data.get("type")
-        self.logger.debug(f"OpenAI event: {msg_type}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("OpenAI event: %s", msg_type)
 
         if msg_type == "error":
             self.logger.error(f"OpenAI error: {data.get('error')}")
@@ -168,11 +293,7 @@ class OpenAIProvider(AIProvider):
             await self._trigger_greeting()
 
         elif msg_type in ("response.audio.delta", "response.output_audio.delta"):
-            audio_base64 = data.get("delta")
-            if audio_base64 and self.audio_callback:
-                audio_bytes = base64.b64decode(audio_base64)
-                self.logger.debug(f"Received {len(audio_bytes)} bytes audio from OpenAI")
-                await self.audio_callback(audio_bytes)
+            await self._handle_audio_delta(data.get("delta"))
 
         elif msg_type == "response.audio.done":
             self.logger.debug("Audio response complete")
@@ -185,7 +306,7 @@ class OpenAIProvider(AIProvider):
         elif msg_type == "input_audio_buffer.speech_stopped":
             self.logger.debug("User speech stopped - triggering response")
             # Manually trigger response in case turn_detection.create_response isn't working
-            await self.ws.send(json.dumps({"type": "response.create"}))
+            await self.ws.send(orjson.dumps({"type": "response.create"}), text=True)
 
         elif msg_type == "conversation.item.input_audio_transcription.completed":
             transcript = data.get("transcript", "")
@@ -203,21 +324,8 @@ class OpenAIProvider(AIProvider):
             return
 
         try:
-            greeting_item = {
-                "type": "conversation.item.create",
-                "item": {
-                    "type": "message",
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "input_text",
-                            "text": "Greet the user briefly and ask how you can help.",
-                        }
-                    ],
-                },
-            }
-            await self.ws.send(json.dumps(greeting_item))
-            await self.ws.send(json.dumps({"type": "response.create"}))
+            for event_json in self._GREETING_EVENTS:
+                await self.ws.send(event_json, text=True)
             self.logger.info("Greeting triggered")
         except Exception as e:
             self.logger.error(f"Error triggering greeting: {e}")
@@ -228,12 +336,14 @@ class OpenAIProvider(AIProvider):
             return
 
         try:
-            audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
-            message = {"type": "input_audio_buffer.append", "audio": audio_base64}
-            await self.ws.send(json.dumps(message))
+            await self.ws.send(self._build_audio_event(audio_bytes), text=True)
         except Exception as e:
             self.logger.error(f"Error sending audio: {e}")
 
+    def _build_audio_event(self, audio_bytes: bytes) -> bytes:
+        """Serialize an input_audio_buffer.append event around the cached envelope."""
+        return self._APPEND_PREFIX + pybase64.b64encode(audio_bytes) + self._APPEND_SUFFIX
+
     async def close(self):
         """Close connection to OpenAI."""
         self.connected = False
@@ -248,6 +358,13 @@ class OpenAIProvider(AIProvider):
 class NovaProvider(AIProvider):
     """Amazon Nova Sonic provider via Bedrock SDK."""
 
+    # Bedrock clients are shared by every call in the same region so their
+    # connection pool and credential resolver are reused. Each call still
+    # opens its own bidirectional stream: Nova Sonic binds one session to a
+    # stream, so streams cannot be multiplexed across calls.
+    _clients: dict = {}
+    _clients_lock = threading.Lock()
+
     def __init__(
         self,
         model_id: str,
@@ -269,53 +386,24 @@ class NovaProvider(AIProvider):
         self.content_name = str(uuid.uuid4())
         self.audio_content_name = str(uuid.uuid4())
 
-    def _initialize_client(self):
-        """Initialize the Bedrock client."""
-        from aws_sdk_bedrock_runtime.client import BedrockRuntimeClient
-        from aws_sdk_bedrock_runtime.config import Config
-        from smithy_aws_core.identity.environment import EnvironmentCredentialsResolver
-
-        config = Config(
-            endpoint_uri=f"https://bedrock-runtime.{self.region}.amazonaws.com",
-            region=self.region,
-            aws_credentials_identity_resolver=EnvironmentCredentialsResolver(),
+        # audioInput events only differ in their content, so the JSON around
+        # it is serialized once
+        self._audio_prefix = (
+            b'{"event":{"audioInput":{"promptName":' + orjson.dumps(self.prompt_name)
+            + b',"contentName":' + orjson.dumps(self.audio_content_name)
+            + b',"content":"'
         )
-        self.client = BedrockRuntimeClient(config=config)
-        self.logger.info(f"Bedrock client initialized: {self.region}")
+        self._audio_suffix = b'"}}}'
 
-    async def _send_event(self, event_json: str):
-        """Send an event to the stream."""
-        if not self.stream:
-            return
-
-        from aws_sdk_bedrock_runtime.models import (
-            InvokeModelWithBidirectionalStreamInputChunk,
-            BidirectionalInputPayloadPart,
-        )
-
-        event = InvokeModelWithBidirectionalStreamInputChunk(
-            value=BidirectionalInputPayloadPart(bytes_=event_json.encode("utf-8"))
-        )
-        await self.stream.input_stream.send(event)
-
-    async def connect(self):
-        """Establish connection to Nova Sonic."""
-        from aws_sdk_bedrock_runtime.client import (
-            InvokeModelWithBidirectionalStreamOperationInput,
-        )
-
-        try:
-            if not self.client:
-                self._initialize_client()
-
-            self.stream = await self.client.invoke_model_with_bidirectional_stream(
-                InvokeModelWithBidirectionalStreamOperationInput(model_id=self.model_id)
-            )
-            self.is_active = True
-            self.logger.info(f"Connected to Nova Sonic: {self.model_id}")
+        # Setup events only depend on the session's names, so they are
+        # serialized up front and connect() just replays them
+        self._setup_events = self._build_setup_events()
 
+    def _build_setup_events(self) -> tuple:
+        """Serialize the constant session setup events once per session."""
+        return (
             # Session setup
-            await self._send_event(json.dumps({
+            orjson.dumps({
                 "event": {
                     "sessionStart": {
                         "inferenceConfiguration": {
@@ -325,10 +413,9 @@ class NovaProvider(AIProvider):
                         }
                     }
                 }
-            }))
-
+            }),
             # Prompt start with audio output config
-            await self._send_event(json.dumps({
+            orjson.dumps({
                 "event": {
                     "promptStart": {
                         "promptName": self.prompt_name,
@@ -344,10 +431,9 @@ class NovaProvider(AIProvider):
                         }
                     }
                 }
-            }))
-
+            }),
             # System prompt
-            await self._send_event(json.dumps({
+            orjson.dumps({
                 "event": {
                     "contentStart": {
                         "promptName": self.prompt_name,
@@ -358,9 +444,8 @@ class NovaProvider(AIProvider):
                         "textInputConfiguration": {"mediaType": "text/plain"}
                     }
                 }
-            }))
-
-            await self._send_event(json.dumps({
+            }),
+            orjson.dumps({
                 "event": {
                     "textInput": {
                         "promptName": self.prompt_name,
@@ -368,19 +453,17 @@ class NovaProvider(AIProvider):
                         "content": self.system_prompt,
                     }
                 }
-            }))
-
-            await self._send_event(json.dumps({
+            }),
+            orjson.dumps({
                 "event": {
                     "contentEnd": {
                         "promptName": self.prompt_name,
                         "contentName": self.content_name,
                     }
                 }
-            }))
-
+            }),
             # Start audio input
-            await self._send_event(json.dumps({
+            orjson.dumps({
                 "event": {
                     "contentStart": {
                         "promptName": self.prompt_name,
@@ -398,7 +481,75 @@ class NovaProvider(AIProvider):
                         }
                     }
                 }
-            }))
+            }),
+        )
+
+    @staticmethod
+    def preload_sdk():
+        """Import the Bedrock SDK so the first call does not pay for it.
+
+        The SDK is an optional dependency, so it is imported lazily; the
+        server runs this in a worker thread at startup.
+        """
+        import aws_sdk_bedrock_runtime.client  # noqa: F401
+        import aws_sdk_bedrock_runtime.config  # noqa: F401
+        import aws_sdk_bedrock_runtime.models  # noqa: F401
+        import smithy_aws_core.identity.environment  # noqa: F401
+
+    def _initialize_client(self):
+        """Initialize the Bedrock client, reusing the region's shared one."""
+        from aws_sdk_bedrock_runtime.client import BedrockRuntimeClient
+        from aws_sdk_bedrock_runtime.config import Config
+        from smithy_aws_core.identity.environment import EnvironmentCredentialsResolver
+
+        with self._clients_lock:
+            client = self._clients.get(self.region)
+            if client is None:
+                config = Config(
+                    endpoint_uri=f"https://bedrock-runtime.{self.region}.amazonaws.com",
+                    region=self.region,
+                    aws_credentials_identity_resolver=EnvironmentCredentialsResolver(),
+                )
+                client = BedrockRuntimeClient(config=config)
+                self._clients[self.region] = client
+                self.logger.info(f"Bedrock client initialized: {self.region}")
+        self.client = client
+
+    async def _send_event(self, event_json: bytes):
+        """Send an event to the stream."""
+        if not self.stream:
+            return
+
+        from aws_sdk_bedrock_runtime.models import (
+            InvokeModelWithBidirectionalStreamInputChunk,
+            BidirectionalInputPayloadPart,
+        )
+
+        event = InvokeModelWithBidirectionalStreamInputChunk(
+            value=BidirectionalInputPayloadPart(bytes_=event_json)
+        )
+        await self.stream.input_stream.send(event)
+
+    async def connect(self):
+        """Establish connection to Nova Sonic."""
+        from aws_sdk_bedrock_runtime.client import (
+            InvokeModelWithBidirectionalStreamOperationInput,
+        )
+
+        try:
+            if not self.client:
+                # Credential resolution and client setup block; keep them off
+                # the event loop so other calls keep streaming
+                await asyncio.to_thread(self._initialize_client)
+
+            self.stream = await self.client.invoke_model_with_bidirectional_stream(
+                InvokeModelWithBidirectionalStreamOperationInput(model_id=self.model_id)
+            )
+            self.is_active = True
+            self.logger.info(f"Connected to Nova Sonic: {self.model_id}")
+
+            for event_json in self._setup_events:
+                await self._send_event(event_json)
 
             self.logger.info("Session configured: PCM16 @ 24kHz")
             asyncio.create_task(self._process_responses())
@@ -418,40 +569,43 @@ class NovaProvider(AIProvider):
         try:
             text_prompt_id = str(uuid.uuid4())
 
-            # contentStart for text prompt
-            await self._send_event(json.dumps({
-                "event": {
-                    "contentStart": {
-                        "promptName": self.prompt_name,
-                        "contentName": text_prompt_id,
-                        "type": "TEXT",
-                        "interactive": True,
-                        "role": "USER",
-                        "textInputConfiguration": {"mediaType": "text/plain"}
+            # Serialize all three events before sending any of them
+            events = (
+                # contentStart for text prompt
+                orjson.dumps({
+                    "event": {
+                        "contentStart": {
+                            "promptName": self.prompt_name,
+                            "contentName": text_prompt_id,
+                            "type": "TEXT",
+                            "interactive": True,
+                            "role": "USER",
+                            "textInputConfiguration": {"mediaType": "text/plain"}
+                        }
                     }
-                }
-            }))
-
-            # textInput with greeting prompt
-            await self._send_event(json.dumps({
-                "event": {
-                    "textInput": {
-                        "promptName": self.prompt_name,
-                        "contentName": text_prompt_id,
-                        "content": "Greet the user briefly and ask how you can help.",
+                }),
+                # textInput with greeting prompt
+                orjson.dumps({
+                    "event": {
+                        "textInput": {
+                            "promptName": self.prompt_name,
+                            "contentName": text_prompt_id,
+                            "content": "Greet the user briefly and ask how you can help.",
+                        }
                     }
-                }
-            }))
-
-            # contentEnd
-            await self._send_event(json.dumps({
-                "event": {
-                    "contentEnd": {
-                        "promptName": self.prompt_name,
-                        "contentName": text_prompt_id,
+                }),
+                # contentEnd
+                orjson.dumps({
+                    "event": {
+                        "contentEnd": {
+                            "promptName": self.prompt_name,
+                            "contentName": text_prompt_id,
+                        }
                     }
-                }
-            }))
+                }),
+            )
+            for event_json in events:
+                await self._send_event(event_json)
 
             self.logger.info("Greeting triggered")
         except Exception as e:
@@ -465,8 +619,7 @@ class NovaProvider(AIProvider):
                 result = await output[1].receive()
 
                 if result.value and result.value.bytes_:
-                    response_data = result.value.bytes_.decode("utf-8")
-                    json_data = json.loads(response_data)
+                    json_data = orjson.loads(result.value.bytes_)
                     await self._handle_response(json_data)
 
         except asyncio.CancelledError:
@@ -485,7 +638,7 @@ class NovaProvider(AIProvider):
         if "audioOutput" in event:
             audio_content = event["audioOutput"].get("content")
             if audio_content and self.audio_callback:
-                audio_bytes = base64.b64decode(audio_content)
+                audio_bytes = pybase64.b64decode(audio_content, validate=False)
                 await self.audio_callback(audio_bytes)
 
         elif "textOutput" in event:
@@ -504,26 +657,21 @@ class NovaProvider(AIProvider):
             return
 
         try:
-            audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
-            await self._send_event(json.dumps({
-                "event": {
-                    "audioInput": {
-                        "promptName": self.prompt_name,
-                        "contentName": self.audio_content_name,
-                        "content": audio_base64,
-                    }
-                }
-            }))
+            await self._send_event(self._build_audio_event(audio_bytes))
         except Exception as e:
             self.logger.error(f"Error sending audio: {e}")
 
+    def _build_audio_event(self, audio_bytes: bytes) -> bytes:
+        """Serialize an audioInput event around the cached envelope."""
+        return self._audio_prefix + pybase64.b64encode(audio_bytes) + self._audio_suffix
+
     async def close(self):
         """Close connection to Nova Sonic."""
         self.is_active = False
 
         if self.stream:
             try:
-                await self._send_event(json.dumps({
+                await self._send_event(orjson.dumps({
                     "event": {
                         "contentEnd": {
                             "promptName": self.prompt_name,
@@ -531,10 +679,10 @@ class NovaProvider(AIProvider):
                         }
                     }
                 }))
-                await self._send_event(json.dumps({
+                await self._send_event(orjson.dumps({
                     "event": {"promptEnd": {"promptName": self.prompt_name}}
                 }))
-                await self._send_event(json.dumps({"event": {"sessionEnd": {}}}))
+                await self._send_event(orjson.dumps({"event": {"sessionEnd": {}}}))
                 await self.stream.input_stream.close()
             except Exception as e:
                 self.logger.warning(f"Error during cleanup: {e}")
@@ -550,42 +698,126 @@ class ClientHandler:
         self.call_id = call_id
         self.provider = provider
         self.logger = logging.getLogger(f"Client-{call_id}")
+        self._upstream: asyncio.Queue = asyncio.Queue(maxsize=UPSTREAM_QUEUE_SIZE)
+        self._downstream: asyncio.Queue = asyncio.Queue(maxsize=DOWNSTREAM_QUEUE_SIZE)
+        # Bumped on barge-in so audio already taken off the queue is discarded
+        self._barge_ins = 0
 
     async def handle(self):
         """Handle client connection lifecycle."""
+        sender = receiver = None
         try:
             self.logger.info("Client connected")
+            tune_tcp(self.websocket.transport)
+            receiver = asyncio.create_task(self._forward_to_client())
             await self.provider.connect()
+            sender = asyncio.create_task(self._forward_audio())
 
+            # websockettransceiver sends audio as binary frames only; raw PCM
+            # goes straight to the provider with no base64/JSON wrapping
             async for message in self.websocket:
                 if isinstance(message, bytes):
-                    await self.provider.send_audio(message)
+                    self._queue_audio(message)
                 else:
-                    data = json.loads(message)
-                    if data.get("type") == "audio":
-                        audio_bytes = base64.b64decode(data.get("data", ""))
-                        await self.provider.send_audio(audio_bytes)
+                    self.logger.debug("Ignoring text message: %.100s", message)
 
         except websockets.exceptions.ConnectionClosed:
             self.logger.info("Client disconnected")
         except Exception as e:
             self.logger.error(f"Error handling client: {e}", exc_info=True)
         finally:
+            for task in (sender, receiver):
+                if task:
+                    task.cancel()
             await self.provider.close()
 
-    async def send_audio_to_client(self, audio_bytes: bytes):
-        """Send audio from AI to GStreamer client."""
+    @staticmethod
+    def _put_latest(queue: asyncio.Queue, audio_bytes: bytes) -> bool:
+        """Queue audio, dropping the oldest entry if full. Returns True on a drop."""
         try:
-            self.logger.debug(f"Sending {len(audio_bytes)} bytes to GStreamer client")
-            await self.websocket.send(audio_bytes)
-        except Exception as e:
-            self.logger.error(f"Error sending audio to client: {e}")
+            queue.put_nowait(audio_bytes)
+            return False
+        except asyncio.QueueFull:
+            # Stale audio is useless for a live call; make room for the newest
+            queue.get_nowait()
+            queue.put_nowait(audio_bytes)
+            return True
+
+    def _queue_audio(self, audio_bytes: bytes):
+        """Queue client audio for the provider without blocking the socket reader."""
+        if self._put_latest(self._upstream, audio_bytes):
+            self.logger.debug("Provider is behind, dropped oldest audio frame")
+
+    async def _forward_audio(self):
+        """Send queued client audio to the provider, a few frames at a time.
+
+        Each provider message costs a base64 encode, a JSON envelope and a
+        send, so consecutive frames are merged into one.
+        """
+        queue = self._upstream
+        while True:
+            audio_bytes = await queue.get()
+
+            if (queue.qsize() + 1) * len(audio_bytes) < AUDIO_COALESCE_BYTES:
+                await asyncio.sleep(AUDIO_COALESCE_SECONDS)
+
+            if not queue.empty():
+                buf = bytearray(audio_bytes)
+                while len(buf) < AUDIO_COALESCE_BYTES and not queue.empty():
+                    buf += queue.get_nowait()
+                audio_bytes = bytes(buf)
+
+            await self.provider.send_audio(audio_bytes)
+
+    async def send_audio_to_client(self, audio_bytes: bytes):
+        """Queue audio from AI for the GStreamer client."""
+        if self._downstream.full():
+            # Provider readers don't yield between already-buffered messages;
+            # let the sender drain before deciding the client is behind
+            await asyncio.sleep(0)
+        if self._put_latest(self._downstream, audio_bytes):
+            self.logger.debug("Client is behind, dropped oldest audio delta")
+
+    async def _forward_to_client(self):
+        """Send queued AI audio to the client, merging deltas below one frame.
+
+        Each client message is a WebSocket frame and a socket write, so small
+        provider deltas are batched up to a 20ms frame.
+        """
+        queue = self._downstream
+        while True:
+            audio_bytes = await queue.get()
+            barge_ins = self._barge_ins
+
+            if len(audio_bytes) < DOWNSTREAM_COALESCE_BYTES and queue.empty():
+                await asyncio.sleep(DOWNSTREAM_COALESCE_SECONDS)
+                if barge_ins != self._barge_ins:
+                    continue
+
+            # Frame-sized deltas go out as they are: websockettransceiver plays
+            # one message per frame tick, so merging them would burst playback
+            if len(audio_bytes) < DOWNSTREAM_COALESCE_BYTES and not queue.empty():
+                buf = bytearray(audio_bytes)
+                while len(buf) < DOWNSTREAM_COALESCE_BYTES and not queue.empty():
+                    buf += queue.get_nowait()
+                audio_bytes = bytes(buf)
+
+            try:
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("Sending %d bytes to GStreamer client", len(audio_bytes))
+                await self.websocket.send(audio_bytes)
+            except Exception as e:
+                self.logger.error(f"Error sending audio to client: {e}")
 
     async def send_barge_in(self):
         """Send barge-in clear command to GStreamer client."""
+        # Drop audio that hasn't gone out yet; the client flushes the rest
+        self._barge_ins += 1
+        while not self._downstream.empty():
+            self._downstream.get_nowait()
         try:
             self.logger.info("Sending barge-in clear command")
-            await self.websocket.send('{"type": "clear"}')
+            await self.websocket.send(CLEAR_MESSAGE)
         except Exception as e:
             self.logger.error(f"Error sending barge-in: {e}")
 
@@ -593,13 +825,22 @@ class ClientHandler:
 class WebSocketServer:
     """WebSocket server for handling GStreamer clients."""
 
-    def __init__(self, host: str, port: int, provider_type: str, provider_config: dict):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        provider_type: str,
+        provider_config: dict,
+        max_clients: int = DEFAULT_MAX_CLIENTS,
+    ):
         self.host = host
         self.port = port
         self.provider_type = provider_type
         self.provider_config = provider_config
+        self.max_clients = max_clients
         self.logger = logging.getLogger("WebSocketServer")
-        self.client_counter = 0
+        self._call_ids = itertools.count(1)
+        self._slots = asyncio.Semaphore(max_clients)
 
     def _create_provider(self, audio_callback, barge_in_callback, call_id: str) -> AIProvider:
         """Create an AI provider instance."""
@@ -626,8 +867,17 @@ class WebSocketServer:
 
     async def handle_client(self, websocket: WebSocketServerProtocol):
         """Handle new client connection."""
-        self.client_counter += 1
-        call_id = f"call-{self.client_counter}"
+        if self._slots.locked():
+            self.logger.warning(f"At capacity ({self.max_clients} clients), rejecting connection")
+            await websocket.close(1013, "Server at capacity, try again later")
+            return
+
+        async with self._slots:
+            await self._run_client(websocket)
+
+    async def _run_client(self, websocket: WebSocketServerProtocol):
+        """Create a provider for the client and run the call to completion."""
+        call_id = f"call-{next(self._call_ids)}"
 
         handler = ClientHandler(websocket, call_id, provider=None)
         provider = self._create_provider(
@@ -645,7 +895,10 @@ class WebSocketServer:
         self.logger.info(f"Provider: {self.provider_type}")
         self.logger.info(f"Audio: PCM16 @ {SAMPLE_RATE}Hz mono")
 
-        async with websockets.serve(self.handle_client, self.host, self.port):
+        if self.provider_type == "nova":
+            await asyncio.to_thread(NovaProvider.preload_sdk)
+
+        async with websockets.serve(self.handle_client, self.host, self.port, compression=None):
             self.logger.info("Server ready, waiting for connections...")
             await asyncio.Future()
 
@@ -665,6 +918,12 @@ async def main():
     parser.add_argument("--host", default=DEFAULT_HOST)
     parser.add_argument("--port", type=int, default=DEFAULT_PORT)
     parser.add_argument("--debug", action="store_true")
+    parser.add_argument(
+        "--max-clients",
+        type=int,
+        default=int(os.environ.get("MAX_CLIENTS", DEFAULT_MAX_CLIENTS)),
+        help=f"Maximum concurrent clients (default: {DEFAULT_MAX_CLIENTS})",
+    )
     parser.add_argument(
         "--system-prompt",
         default="You are a helpful voice assistant. Be concise.",
@@ -689,8 +948,7 @@ async def main():
 
     args = parser.parse_args()
 
-    global logger
-    logger = setup_logging(args.debug)
+    setup_logging(args.debug)
 
     # Build provider config
     if args.provider == "openai":
@@ -715,6 +973,7 @@ async def main():
             port=args.port,
             provider_type=args.provider,
             provider_config=provider_config,
+            max_clients=args.max_clients,
         )
         await server.start()
     except KeyboardInterrupt:
@@ -725,4 +984,9 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())